@@ -2,25 +2,125 @@
 Design Analyzer
 Core analysis engine for detecting failure patterns in design documents
 """
-import asyncio
 import difflib
-from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+import re
+from contextlib import aclosing
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
 
 from app.config import settings
-from app.llm import llm_client
-from app.models import ConfidenceLevel, Finding
+from app.llm import LLMError, get_llm_client
+from app.models import ConfidenceLevel, DocumentAnalysisResponse, FailurePattern, Finding, PatternMatch
 from app.patterns import get_all_patterns
 
+logger = logging.getLogger(__name__)
+
 ProgressCallback = Callable[[str, Optional[dict]], Awaitable[None]]
 
+ANALYSIS_SYSTEM_PROMPT = """You are an expert in distributed systems and failure analysis.
+Your task is to identify potential failure modes, implicit assumptions, and information gaps in system design documents.
+Be conservative - only report patterns with clear evidence.
+Focus on what could go wrong, not what's already addressed."""
+
+# Instructions are identical for every document, so they go in the system prompt
+# ahead of the document. The pattern list is appended last.
+ANALYSIS_TASKS = """For the design document you are given, complete all four tasks below.
+
+TASK 1 - IMPLICIT ASSUMPTIONS ("assumptions")
+3-5 specific, evidence-based unstated expectations about load behavior, network
+reliability, data consistency, timing and ordering, resource availability, or
+third-party services.
+
+TASK 2 - KNOWN UNKNOWNS ("unknowns")
+3-5 critical information gaps, e.g. performance requirements, failure handling,
+scaling strategy, monitoring, SLOs/SLAs. Say what's missing and why it matters.
+
+TASK 3 - RULED-OUT RISKS ("ruled_out")
+Up to 5 names from FAILURE PATTERNS that explicit design choices clearly rule out.
+Leave out anything you report as a match.
+
+TASK 4 - FAILURE PATTERNS ("matches")
+Each pattern from FAILURE PATTERNS with clear evidence in the document: exact
+pattern name, confidence (high/medium/low), evidence (quotes or references from
+the document), trigger conditions, why it's easy to miss, discussion questions
+for the team, and match_score (0-1). Return an empty matches array if none apply.
+
+FAILURE PATTERNS:
+"""
+
+_CONF_RANK = {"high": 3, "medium": 2, "low": 1}
+
+# Below this many characters (ignoring surrounding whitespace) there is no design to review
+MIN_DOCUMENT_CHARS = 20
+
+# A list item minus any bullet or "1." numbering the model put in front of it
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-•*]+\s+)?(?:\d+[.)]\s+)?(.*?)\s*$", re.DOTALL)
+_EMPTY_ITEMS = frozenset({"", "none", "n/a"})
+
+
+def _trie_regex(phrases: List[str]) -> str:
+    """Regex alternation for phrases with shared prefixes merged, e.g. ``retr(?:y(?: storm)?|ies)``.
+
+    The engine follows a single branch per character instead of retrying every
+    phrase at every position. Optional tails are greedy, so the longest phrase wins.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        return group + "?" if "" in node else group
+
+    return render(trie)
+
+
+# JSON schema the LLM output is constrained to
+DOCUMENT_ANALYSIS_SCHEMA = DocumentAnalysisResponse.model_json_schema()
+
 
 class DesignAnalyzer:
     """Main analyzer for design documents"""
 
     def __init__(self):
         self.patterns = get_all_patterns()
-        self.llm = llm_client
+        self.llm = get_llm_client()
         self._pattern_names = [p.name for p in self.patterns]
+        self._pattern_name_index = {p.name.lower(): p for p in self.patterns}
+        # The pattern list is static, so its prompt text is built once
+        self._pattern_descriptions = self._describe_patterns(self.patterns)
+        self._system_prompt = self._build_system_prompt(self._pattern_descriptions)
+
+        # One trie-shaped alternation over every (lowercased) indicator, so a
+        # single scan of the document finds all keyword hits
+        indicator_ids: Dict[str, set] = {}
+        for p in self.patterns:
+            for indicator in p.indicators:
+                indicator_ids.setdefault(indicator.lower(), set()).add(p.id)
+
+        # The scan reports the longest indicator starting at each word, so a hit
+        # also credits every indicator it contains ("shared connection pool"
+        # counts for "connection pool" too)
+        word_res = {i: re.compile(rf"\b{re.escape(i)}\b") for i in indicator_ids}
+        self._indicator_hits: Dict[str, frozenset] = {
+            indicator: frozenset().union(
+                *(ids for other, ids in indicator_ids.items() if word_res[other].search(indicator))
+            )
+            for indicator in indicator_ids
+        }
+        # A zero-width lookahead lets matches overlap: every word is tried as a
+        # start, not just the text after the previous match
+        self._indicator_re = re.compile(rf"\b(?=({_trie_regex(list(indicator_ids))})\b)")
 
     async def analyze(
         self,
@@ -39,26 +139,39 @@ class DesignAnalyzer:
 
         await progress("start")
 
-        # Round 1: pattern matching, assumptions, and unknowns run in parallel
-        findings, assumptions, unknowns = await asyncio.gather(
-            self._match_patterns(document, context),
-            self._extract_assumptions(document, context),
-            self._find_known_unknowns(document, context),
-        )
+        # Pattern matching, assumptions, unknowns, and ruled-out risks in a single LLM pass
+        async def on_finding(finding: Finding):
+            await progress("finding", self._finding_to_dict(finding))
+
+        if len(document.strip()) < MIN_DOCUMENT_CHARS:
+            # Nothing to analyze, so skip the LLM call and report an empty review
+            findings, assumptions, unknowns, ruled_out = [], [], [], []
+        else:
+            prefix = self._document_prefix(document, context)
+            findings, assumptions, unknowns, ruled_out = await self._combined_pass(document, prefix, on_finding)
+        failure_modes = [self._finding_to_dict(f) for f in findings]
 
         await progress("patterns_done", {"count": len(findings)})
 
-        # Round 2: ruled-out depends on findings from round 1
-        ruled_out = await self._identify_ruled_out_risks(document, findings)
+        summary = self._generate_summary(findings, assumptions)
+
+        # Findings already went out one by one as they streamed in; the report
+        # sections follow once the model has finished
+        for phase, data in (
+            ("failure_modes", failure_modes),
+            ("implicit_assumptions", assumptions),
+            ("known_unknowns", unknowns),
+            ("ruled_out_risks", ruled_out),
+            ("summary", summary),
+        ):
+            await progress("phase", {"phase": phase, "data": data})
 
         await progress("analysis_done")
 
-        summary = self._generate_summary(findings, assumptions)
-
         await progress("complete")
 
         return {
-            "failure_modes": [self._finding_to_dict(f) for f in findings],
+            "failure_modes": failure_modes,
             "implicit_assumptions": assumptions,
             "ruled_out_risks": ruled_out,
             "known_unknowns": unknowns,
@@ -67,164 +180,151 @@ class DesignAnalyzer:
 
     def _resolve_pattern(self, name: str):
         """Find the best matching pattern — exact first, then fuzzy fallback."""
-        pattern = next((p for p in self.patterns if p.name.lower() == name.lower()), None)
+        pattern = self._pattern_name_index.get(name.lower())
         if pattern:
             return pattern
         close = difflib.get_close_matches(name, self._pattern_names, n=1, cutoff=0.6)
         if close:
-            return next((p for p in self.patterns if p.name == close[0]), None)
+            return self._pattern_name_index[close[0].lower()]
         return None
 
-    async def _match_patterns(self, document: str, context: Dict) -> List[Finding]:
-        """Match document against failure patterns"""
-        pattern_descriptions = "\n".join([
-            f"{i+1}. {p.name}: {p.description}\n   Key signals: {', '.join(p.indicators)}"
-            for i, p in enumerate(self.patterns)
+    @staticmethod
+    def _describe_patterns(patterns: List[FailurePattern]) -> str:
+        return "\n".join([
+            f"{i+1}. {p.name}: {p.description}\n   Signals: {', '.join(p.indicators)}"
+            for i, p in enumerate(patterns)
         ])
 
-        system_prompt = """You are an expert in distributed systems and failure analysis.
-Your task is to identify potential failure modes in system design documents.
-Be conservative - only report patterns with clear evidence.
-Focus on what could go wrong, not what's already addressed."""
-
-        prompt = f"""Analyze this design document for potential failure patterns.
-
-DESIGN DOCUMENT:
-{document}
-
-{f"CONTEXT: {context}" if context else ""}
-
-FAILURE PATTERNS TO CHECK:
-{pattern_descriptions}
-
-For each pattern that matches, provide:
-1. Pattern name (exact match from list above)
-2. Confidence (high/medium/low)
-3. Evidence (specific quotes or references from document)
-4. Trigger conditions (what would cause this failure)
-5. Why it's easy to miss
-6. Discussion questions for the team
-
-Respond in JSON format:
-{{
-  "matches": [
-    {{
-      "pattern_name": "...",
-      "confidence": "high|medium|low",
-      "match_score": 0.85,
-      "evidence": ["quote 1", "quote 2"],
-      "trigger_conditions": ["condition 1", "condition 2"],
-      "why_easy_to_miss": "explanation",
-      "discussion_questions": ["question 1", "question 2"]
-    }}
-  ]
-}}
-
-Only include patterns with clear evidence. Return empty matches array if no patterns found."""
-
-        try:
-            result = await self.llm.generate_json(prompt, system_prompt)
-            matches = result.get("matches", [])
-
-            findings = []
-            for match in matches[: settings.max_failure_modes]:
-                pattern = self._resolve_pattern(match.get("pattern_name", ""))
-
-                if pattern and match.get("match_score", 0) >= settings.confidence_threshold:
-                    finding = Finding(
-                        pattern_id=pattern.id,
-                        pattern_name=pattern.name,
-                        confidence=ConfidenceLevel(match["confidence"]),
-                        match_score=match["match_score"],
-                        evidence=match.get("evidence", []),
-                        trigger_conditions=match.get("trigger_conditions", []),
-                        why_easy_to_miss=match.get("why_easy_to_miss", pattern.why_easy_to_miss),
-                        discussion_questions=match.get("discussion_questions", []),
-                    )
-                    findings.append(finding)
-
-            findings.sort(
-                key=lambda f: ({"high": 3, "medium": 2, "low": 1}[f.confidence], f.match_score),
-                reverse=True,
-            )
-            return findings
-
-        except Exception as e:
-            print(f"Pattern matching error: {e}")
-            return []
-
-    async def _extract_assumptions(self, document: str, context: Dict) -> List[str]:
-        """Extract implicit assumptions from document"""
-        prompt = f"""Analyze this design document and identify implicit assumptions.
-Look for unstated expectations about:
-- System behavior under load
-- Network reliability
-- Data consistency
-- Timing and ordering
-- Resource availability
-- Third-party services
-
-DOCUMENT:
-{document}
-
-List 3-5 key implicit assumptions. Be specific and evidence-based.
-Respond as JSON: {{"assumptions": ["assumption 1", "assumption 2", ...]}}"""
-
+    def _candidate_patterns(self, document: str) -> List[FailurePattern]:
+        """Patterns with at least one indicator appearing verbatim in the document"""
+        hit_ids = set()
+        # Lowercasing once is cheaper than case-folding every comparison with
+        # re.IGNORECASE, and hits then need no per-match lower()
+        for m in self._indicator_re.finditer(document.lower()):
+            hit_ids |= self._indicator_hits[m.group(1)]
+            if len(hit_ids) == len(self.patterns):
+                break
+        return [p for p in self.patterns if p.id in hit_ids]
+
+    def _patterns_prompt(self, document: str) -> str:
+        """Pattern list for the prompt, optionally narrowed to keyword candidates"""
+        if not settings.pattern_prefilter:
+            return self._pattern_descriptions
+        candidates = self._candidate_patterns(document)
+        if not candidates:
+            return "(no candidate patterns for this document - return an empty matches array)"
+        return self._describe_patterns(candidates)
+
+    @staticmethod
+    def _build_system_prompt(patterns_text: str) -> str:
+        """Persona, task instructions, then the pattern list.
+
+        Without the pre-filter this is the same for every document, so the model
+        server can reuse its prefix KV cache and only prefill the document.
+        """
+        return f"{ANALYSIS_SYSTEM_PROMPT}\n\n{ANALYSIS_TASKS}{patterns_text}"
+
+    @staticmethod
+    def _document_prefix(document: str, context: Dict) -> str:
+        """The document and its context, rendered once per analysis"""
+        prefix = f"DESIGN DOCUMENT:\n{document}\n"
+        if context:
+            prefix += f"\nCONTEXT: {context}\n"
+        return prefix
+
+    def _build_finding(self, match: Dict) -> Optional[Finding]:
+        """Turn one LLM match into a Finding, or None if unknown, low-scoring, or malformed"""
+        # Nothing enforces the schema for Anthropic, so check types before using any field
         try:
-            result = await self.llm.generate_json(prompt)
-            return result.get("assumptions", [])[:5]
-        except Exception as e:
-            print(f"Assumption extraction error: {e}")
-            return []
-
-    async def _identify_ruled_out_risks(self, document: str, findings: List[Finding]) -> List[str]:
-        """Identify risks that are explicitly ruled out"""
-        found_patterns = {f.pattern_name for f in findings}
-        not_found = [p.name for p in self.patterns if p.name not in found_patterns]
-
-        if not not_found:
-            return []
-
-        prompt = f"""Based on this document, which of these failure patterns are explicitly NOT applicable?
-
-DOCUMENT:
-{document}
-
-PATTERNS TO CHECK:
-{chr(10).join(f"- {p}" for p in not_found[:10])}
-
-Only include patterns that are clearly ruled out by explicit design choices.
-Respond as JSON: {{"ruled_out": ["pattern 1", "pattern 2", ...]}}"""
+            parsed = PatternMatch.model_validate(match)
+        except ValidationError:
+            return None
+        # Cheap score check first so low scorers never reach the fuzzy name lookup
+        if parsed.match_score < settings.confidence_threshold:
+            return None
+        pattern = self._resolve_pattern(parsed.pattern_name)
+        if not pattern:
+            return None
+        return Finding(
+            pattern_id=pattern.id,
+            pattern_name=pattern.name,
+            confidence=parsed.confidence,
+            match_score=parsed.match_score,
+            evidence=parsed.evidence,
+            trigger_conditions=parsed.trigger_conditions,
+            why_easy_to_miss=parsed.why_easy_to_miss or pattern.why_easy_to_miss,
+            discussion_questions=parsed.discussion_questions,
+        )
 
-        try:
-            result = await self.llm.generate_json(prompt)
-            return result.get("ruled_out", [])[:5]
-        except Exception as e:
-            print(f"Ruled-out risks error: {e}")
-            return []
-
-    async def _find_known_unknowns(self, document: str, context: Dict) -> List[str]:
-        """Identify areas where critical information is missing"""
-        prompt = f"""Identify critical information gaps in this design document.
-Look for:
-- Missing performance requirements
-- Unspecified failure handling
-- Unclear scaling strategy
-- Missing monitoring/observability
-- Undefined SLOs or SLAs
-
-DOCUMENT:
-{document}
-
-List 3-5 critical known unknowns. Be specific about what's missing and why it matters.
-Respond as JSON: {{"unknowns": ["unknown 1", "unknown 2", ...]}}"""
+    async def _combined_pass(
+        self,
+        document: str,
+        prefix: str,
+        on_finding: Optional[Callable[[Finding], Awaitable[None]]] = None,
+    ) -> Tuple[List[Finding], List[str], List[str], List[str]]:
+        """Match failure patterns, extract assumptions, find known unknowns, and spot ruled-out risks in one LLM call.
+
+        The document is sent (and processed by the model) once instead of once
+        per task. Matches are consumed as they stream in.
+        """
+        if settings.pattern_prefilter:
+            system_prompt = self._build_system_prompt(self._patterns_prompt(document))
+        else:
+            system_prompt = self._system_prompt
+        prompt = f"{prefix}\nAnalyze the design document above and complete all four tasks."
+
+        findings: List[Finding] = []
+        assumptions: List[str] = []
+        unknowns: List[str] = []
+        ruled_out: List[str] = []
+        lists = {"assumptions": assumptions, "unknowns": unknowns, "ruled_out": ruled_out}
 
         try:
-            result = await self.llm.generate_json(prompt)
-            return result.get("unknowns", [])[:5]
-        except Exception as e:
-            print(f"Known unknowns error: {e}")
-            return []
+            received = 0
+            # Schema field order puts the short lists first, so matches arrive last
+            # and generation can stop early once enough of them are in
+            stream = self.llm.stream_json(prompt, system_prompt, schema=DOCUMENT_ANALYSIS_SCHEMA)
+            async with aclosing(stream) as items:
+                async for key, value in items:
+                    if key in lists:
+                        item = self._clean_list_item(value)
+                        if item:
+                            lists[key].append(item)
+                    elif key == "matches":
+                        received += 1
+                        finding = self._build_finding(value)
+                        if finding:
+                            findings.append(finding)
+                            if on_finding:
+                                await on_finding(finding)
+                        if received >= settings.max_failure_modes:
+                            break
+
+        except (LLMError, ValueError, KeyError) as e:
+            logger.exception("Pattern matching failed, returning partial results: %s", e)
+
+        findings.sort(
+            key=lambda f: (_CONF_RANK[f.confidence], f.match_score),
+            reverse=True,
+        )
+        return findings, assumptions[:5], unknowns[:5], self._clean_ruled_out(ruled_out, findings)
+
+    @staticmethod
+    def _clean_list_item(value) -> Optional[str]:
+        """Strip list markup from one streamed string item, or None if it is empty or a placeholder"""
+        if not isinstance(value, str):
+            return None
+        text = _LIST_ITEM_RE.match(value).group(1)
+        return None if text.lower() in _EMPTY_ITEMS else text
+
+    def _clean_ruled_out(self, names: List[str], findings: List[Finding]) -> List[str]:
+        """Canonical pattern names from the model's ruled-out list, minus anything it also matched"""
+        found = {f.pattern_id for f in findings}
+        resolve = self._resolve_pattern
+        patterns = (resolve(name) for name in names if isinstance(name, str))
+        # dict.fromkeys dedupes in order without a linear "not in list" scan per name
+        ruled_out = dict.fromkeys(p.name for p in patterns if p and p.id not in found)
+        return list(ruled_out)[:5]
 
     def _generate_summary(self, findings: List[Finding], assumptions: List[str]) -> str:
         """Generate executive summary"""
@@ -254,16 +354,7 @@ Respond as JSON: {{"unknowns": ["unknown 1", "unknown 2", ...]}}"""
 
     def _finding_to_dict(self, finding: Finding) -> Dict:
         """Convert Finding to dictionary"""
-        return {
-            "pattern_id": finding.pattern_id,
-            "pattern_name": finding.pattern_name,
-            "confidence": finding.confidence,
-            "match_score": finding.match_score,
-            "evidence": finding.evidence,
-            "trigger_conditions": finding.trigger_conditions,
-            "why_easy_to_miss": finding.why_easy_to_miss,
-            "discussion_questions": finding.discussion_questions,
-        }
+        return finding.model_dump()
 
     async def check_llm_health(self) -> bool:
         """Check if LLM service is healthy"""
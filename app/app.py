@@ -3,33 +3,52 @@ Second Opinion - Pre-mortem Review Tool
 Main FastAPI application with all routes and core logic
 """
 import asyncio
+import codecs
 import io
-import json
+import logging
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
 from starlette.requests import Request
+import orjson
 import uvicorn
 
 from app.analyzer import DesignAnalyzer
 from app.config import settings
+from app.logger import start_logging, stop_logging
+from app.pdf import PDFExtractionError, extract_pdf_text, pypdf
 
 BASE_DIR = Path(__file__).parent
+UPLOAD_CHUNK_SIZE = 64 * 1024
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ALLOWED_EXTENSIONS = frozenset({".md", ".txt", ".rst", ".adoc", ".pdf"})
+
+logger = logging.getLogger(__name__)
 
 analyzer = DesignAnalyzer()
 
+# PDF parsing is CPU-bound pure Python; run it in worker processes so it doesn't
+# stall other requests. "spawn" keeps workers from inheriting the app's threads.
+pdf_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_logging()
     yield
     await analyzer.llm.close()
+    pdf_pool.shutdown(wait=False, cancel_futures=True)
+    stop_logging()
 
 
 app = FastAPI(
@@ -37,6 +56,7 @@ app = FastAPI(
     description="Pre-mortem review tool for engineering design documents",
     version="2.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
@@ -63,19 +83,8 @@ async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-@app.post("/api/analyze", response_model=AnalysisResponse)
-async def analyze_document(request: AnalysisRequest):
-    """Analyze a design document — non-streaming version"""
-    try:
-        results = await analyzer.analyze(document=request.document, context=request.context)
-        return AnalysisResponse(**results)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-
-
-@app.post("/api/analyze/stream")
-async def analyze_stream(request: AnalysisRequest):
-    """Analyze a design document with Server-Sent Events for live progress"""
+async def _analysis_events(request: AnalysisRequest) -> AsyncIterator[dict]:
+    """Run an analysis in a background task and yield its events as they happen"""
     queue: asyncio.Queue = asyncio.Queue()
 
     async def run_analysis():
@@ -90,22 +99,96 @@ async def analyze_stream(request: AnalysisRequest):
             )
             await queue.put({"type": "complete", "results": results})
         except Exception as e:
+            logger.exception("Streaming analysis failed")
             await queue.put({"type": "error", "message": str(e)})
         finally:
             await queue.put(None)  # sentinel
 
-    asyncio.create_task(run_analysis())
-
-    async def event_stream():
+    task = asyncio.create_task(run_analysis())
+    try:
         while True:
             item = await queue.get()
             if item is None:
                 break
-            yield f"data: {json.dumps(item)}\n\n"
+            yield item
+    finally:
+        # If the client disconnects, stop the analysis so the LLM call is aborted too
+        task.cancel()
+
+
+@app.post("/api/analyze", response_model=AnalysisResponse)
+async def analyze_document(request: AnalysisRequest, accept: Optional[str] = Header(None)):
+    """Analyze a design document — non-streaming version.
+
+    Clients that send ``Accept: application/x-ndjson`` instead get one JSON
+    line per finding as the model emits it, then one per report section.
+    """
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return StreamingResponse(_ndjson_stream(request), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        results = await analyzer.analyze(document=request.document, context=request.context)
+        return AnalysisResponse(**results)
+    except Exception as e:
+        logger.exception("Analysis failed")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+async def _ndjson_stream(request: AnalysisRequest) -> AsyncIterator[bytes]:
+    async for item in _analysis_events(request):
+        step = item.get("step")
+        if step == "finding":
+            yield orjson.dumps({"phase": "finding", "data": item["data"]}) + b"\n"
+        elif step == "phase":
+            yield orjson.dumps(item["data"]) + b"\n"
+        elif item["type"] == "error":
+            yield orjson.dumps({"phase": "error", "data": f"Analysis failed: {item['message']}"}) + b"\n"
+
+
+@app.post("/api/analyze/stream")
+async def analyze_stream(request: AnalysisRequest):
+    """Analyze a design document with Server-Sent Events for live progress"""
+
+    async def event_stream():
+        async for item in _analysis_events(request):
+            # Report sections are only for NDJSON; the complete event already carries them
+            if item["type"] == "progress" and item["step"] == "phase":
+                continue
+            yield b"data: " + orjson.dumps(item) + b"\n\n"
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
+def _too_large(limit: int, unit: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large. Max size: {limit} {unit}")
+
+
+async def _read_upload_bytes(file: UploadFile, limit: int) -> bytes:
+    """Read an upload in chunks, rejecting it as soon as it exceeds limit bytes"""
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            raise _too_large(limit, "bytes")
+    return bytes(buffer)
+
+
+async def _read_text_upload(file: UploadFile) -> str:
+    """Decode a UTF-8 upload incrementally, rejecting it once it exceeds max_document_size"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    text = io.StringIO()
+    length = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            length += text.write(decoder.decode(chunk))
+            if length > settings.max_document_size:
+                raise _too_large(settings.max_document_size, "characters")
+        text.write(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    return text.getvalue()
+
+
 @app.post("/api/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -117,33 +200,29 @@ async def upload_file(
     Upload and analyze a design document file.
     Supports: .md, .txt, .rst, .adoc, .pdf
     """
-    allowed_extensions = {".md", ".txt", ".rst", ".adoc", ".pdf"}
     file_ext = os.path.splitext(file.filename)[1].lower()
 
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type. Allowed: {', '.join(sorted(allowed_extensions))}",
+            detail=f"Unsupported file type. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}",
         )
 
-    content = await file.read()
-
     if file_ext == ".pdf":
-        try:
-            import pypdf
-
-            reader = pypdf.PdfReader(io.BytesIO(content))
-            pages_text = [page.extract_text() for page in reader.pages]
-            document_text = "\n\n".join(t for t in pages_text if t)
-            if not document_text.strip():
-                raise HTTPException(status_code=400, detail="Could not extract text from PDF. The file may be scanned or image-only.")
-        except ImportError:
+        if pypdf is None:
             raise HTTPException(status_code=500, detail="PDF support requires pypdf. Run: pip install pypdf")
-    else:
+        content = await _read_upload_bytes(file, settings.max_upload_size)
         try:
-            document_text = content.decode("utf-8")
-        except UnicodeDecodeError:
-            raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+            loop = asyncio.get_running_loop()
+            document_text = await loop.run_in_executor(pdf_pool, extract_pdf_text, content)
+        except PDFExtractionError as e:
+            raise HTTPException(status_code=400, detail=f"Could not read PDF: {e}")
+        if not document_text.strip():
+            raise HTTPException(status_code=400, detail="Could not extract text from PDF. The file may be scanned or image-only.")
+        if len(document_text) > settings.max_document_size:
+            raise _too_large(settings.max_document_size, "characters")
+    else:
+        document_text = await _read_text_upload(file)
 
     context = {}
     if context_scale:
@@ -155,14 +234,15 @@ async def upload_file(
 
     try:
         results = await analyzer.analyze(document=document_text, context=context)
-        return JSONResponse(content=results)
+        return ORJSONResponse(content=results)
     except Exception as e:
+        logger.exception("Upload analysis failed")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
-@app.get("/api/patterns")
-async def list_patterns():
-    """List all available failure patterns"""
+@lru_cache(maxsize=1)
+def get_pattern_catalog() -> dict:
+    """Pattern listing payload — the library is static, so build it once per process"""
     return {
         "patterns": [
             {
@@ -176,6 +256,12 @@ async def list_patterns():
     }
 
 
+@app.get("/api/patterns")
+async def list_patterns():
+    """List all available failure patterns"""
+    return get_pattern_catalog()
+
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,143 @@
+"""
+Response Cache
+Bounded caches for LLM responses keyed by prompt hash, in memory (LRU) or on disk
+"""
+import copy
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash prompt parts after trimming, collapsing whitespace, and lowercasing."""
+    normalized = "\x00".join(
+        _WHITESPACE_RE.sub(" ", str(part or "")).strip().lower() for part in parts
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache with an optional per-entry TTL (seconds, 0 = never expire)"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024, ttl: int = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if self.ttl and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        # Callers get their own copy so they can't mutate the cached response
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        pass
+
+
+class DiskResponseCache:
+    """SQLite-backed cache with the same interface, so responses survive restarts.
+
+    Entries are evicted in write order (oldest first) past max_entries, not
+    by recency of use. Calls block on file I/O, so async callers should run
+    them in a thread. A database error is logged and treated as a miss or a
+    skipped write; the cache is never worth failing a request over.
+    """
+
+    # Tells CachedLLMClient to keep these calls off the event loop
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 1024, ttl: int = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(Path(path).expanduser(), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        # The connection is shared by worker threads; sqlite3 leaves serializing it to us
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT stored_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+
+                stored_at, value = row
+                # Wall-clock time, since entries outlive the process
+                if self.ttl and time.time() - stored_at > self.ttl:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                try:
+                    return json.loads(value)
+                except ValueError:
+                    # A corrupt row would otherwise break this prompt until it expires
+                    logger.warning("Dropping unreadable response cache entry %s", key)
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+        except sqlite3.Error as e:
+            logger.warning("Response cache read failed, treating as a miss: %s", e)
+            return None
+
+    def set(self, key: str, value: Any):
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, time.time(), json.dumps(value)),
+                )
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning("Response cache write failed, skipping: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -2,7 +2,7 @@
 Configuration Management
 Centralized settings using Pydantic BaseSettings
 """
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -15,24 +15,39 @@ class Settings(BaseSettings):
     ollama_model: str = "llama3"
     ollama_base_url: str = "http://localhost:11434"
     ollama_timeout: int = 120
+    ollama_keep_alive: str = "30m"  # keep the model (and its prompt cache) loaded between requests
+    ollama_num_parallel: int = 4  # match the server's OLLAMA_NUM_PARALLEL; extra requests wait here
 
     # Anthropic Configuration
     anthropic_api_key: str = ""
     anthropic_model: str = "claude-sonnet-4-6"
 
+    # Sampling temperature for all LLM calls; 0 keeps output deterministic and cacheable
+    llm_temperature: float = 0.0
+    # Output token budget per LLM call. All four analysis tasks share one response
+    # and matches come last, so a tight budget truncates them first.
+    llm_max_output_tokens: int = 8192
+
     # Analysis Configuration
     max_document_size: int = 50000  # characters
+    max_upload_size: int = 10 * 1024 * 1024  # bytes, for binary uploads such as PDFs
     confidence_threshold: float = 0.6
     max_failure_modes: int = 10
+    # Only send patterns whose indicators appear verbatim in the document to the LLM.
+    # Cuts prompt size, but can miss patterns the model would infer from paraphrases.
+    pattern_prefilter: bool = False
+
+    # Response Cache Configuration
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl: int = 3600  # seconds, 0 = never expire
+    llm_cache_path: str = ""  # SQLite file to persist the cache across restarts; empty = memory only
 
     # Application Configuration
     debug: bool = False
     log_level: str = "INFO"
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        case_sensitive = False
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=False)
 
 
 # Global settings instance
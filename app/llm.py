@@ -2,13 +2,35 @@
 LLM Integration
 Multi-provider LLM client supporting Ollama and Anthropic
 """
+import asyncio
 import json
+import re
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 import httpx
+import orjson
 
+from app.cache import DiskResponseCache, ResponseCache, make_cache_key
 from app.config import settings
+from app.streaming import JSONStreamParser
+
+
+class LLMError(Exception):
+    """Raised when an LLM provider call fails or returns unusable output"""
+
+
+JSON_ONLY_INSTRUCTION = "\n\nYou must respond with valid JSON only. No markdown, no explanation."
+
+# A markdown code fence around the whole response, with an optional json tag
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# Seconds an idle connection to Ollama stays pooled
+OLLAMA_KEEPALIVE_EXPIRY = 300
+# Health probes are a cheap GET; don't let them wait out the generation timeout
+HEALTH_CHECK_TIMEOUT = 5.0
 
 
 class BaseLLMClient(ABC):
@@ -19,10 +41,43 @@ class BaseLLMClient(ABC):
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.3,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
     ) -> Dict[Any, Any]:
         pass
 
+    @abstractmethod
+    def _stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """Yield raw response text chunks as the model generates them."""
+
+    async def stream_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield (key, element) pairs from top-level JSON arrays as each element closes.
+
+        Closing the generator early (e.g. via contextlib.aclosing) aborts the
+        underlying request so the model stops generating. Raises LLMError after
+        the last element if the response ended before its JSON object closed,
+        e.g. when it hit the output token limit.
+        """
+        parser = JSONStreamParser()
+        async with aclosing(self._stream_text(prompt, system_prompt, temperature, schema)) as chunks:
+            async for chunk in chunks:
+                for item in parser.feed(chunk):
+                    yield item
+        if not parser.complete:
+            raise LLMError("Streamed response ended before the JSON object closed")
+
     @abstractmethod
     async def check_health(self) -> bool:
         pass
@@ -31,21 +86,28 @@ class BaseLLMClient(ABC):
     async def close(self):
         pass
 
+    @staticmethod
+    def _resolve_temperature(temperature: Optional[float]) -> float:
+        return settings.llm_temperature if temperature is None else temperature
+
+    @staticmethod
+    def _schema_system_prompt(system_prompt: Optional[str], schema: Optional[Dict]) -> str:
+        """JSON-only instruction plus the schema, for providers that cannot enforce one."""
+        json_system = (system_prompt or "") + JSON_ONLY_INSTRUCTION
+        if schema:
+            json_system += f"\nThe JSON must conform to this schema:\n{json.dumps(schema)}"
+        return json_system
+
     @staticmethod
     def _extract_json(response: str) -> Dict:
         """Strip markdown fences and parse JSON."""
-        cleaned = response.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        if cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
         try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse JSON response: {str(e)}\nResponse: {response}")
+            parsed = orjson.loads(_FENCE_RE.sub("", response))
+        except orjson.JSONDecodeError as e:
+            raise LLMError(f"Failed to parse JSON response: {str(e)}\nResponse: {response}")
+        if not isinstance(parsed, dict):
+            raise LLMError(f"Expected a JSON object, got: {response}")
+        return parsed
 
 
 class OllamaClient(BaseLLMClient):
@@ -54,38 +116,93 @@ class OllamaClient(BaseLLMClient):
     def __init__(self):
         self.base_url = settings.ollama_base_url
         self.model = settings.ollama_model
-        self.client = httpx.AsyncClient(timeout=settings.ollama_timeout)
+        self.keep_alive = settings.ollama_keep_alive
+        self.generate_url = f"{self.base_url}/api/generate"
+        self.tags_url = f"{self.base_url}/api/tags"
+        # One pooled client for the app's lifetime. Analyses are usually minutes
+        # apart, so idle connections are kept well past httpx's 5 s default
+        # instead of reconnecting for every request.
+        self.client = httpx.AsyncClient(
+            timeout=settings.ollama_timeout,
+            limits=httpx.Limits(
+                max_keepalive_connections=settings.ollama_num_parallel,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+            ),
+        )
+        # Concurrent analyses share the model server; requests beyond its parallel
+        # slots would only queue server-side and eat into the HTTP timeout
+        self._slots = asyncio.Semaphore(settings.ollama_num_parallel)
 
     async def generate_json(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.3,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
     ) -> Dict[Any, Any]:
-        json_system = (system_prompt or "") + "\n\nYou must respond with valid JSON only. No markdown, no explanation."
-
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": temperature, "num_predict": 4000},
-        }
-        if json_system:
-            payload["system"] = json_system
+        payload = self._build_payload(prompt, system_prompt, temperature, schema, stream=False)
 
         try:
-            response = await self.client.post(f"{self.base_url}/api/generate", json=payload)
+            async with self._slots:
+                response = await self.client.post(self.generate_url, json=payload)
             response.raise_for_status()
-            raw = response.json().get("response", "")
+            raw = orjson.loads(response.content).get("response", "")
             return self._extract_json(raw)
         except httpx.HTTPStatusError as e:
-            raise Exception(f"Ollama API error: {e.response.status_code} - {e.response.text}")
-        except Exception as e:
-            raise Exception(f"Ollama generation failed: {str(e)}")
+            raise LLMError(f"Ollama API error: {e.response.status_code} - {e.response.text}")
+        except (httpx.HTTPError, ValueError) as e:
+            raise LLMError(f"Ollama generation failed: {str(e)}")
+
+    async def _stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        payload = self._build_payload(prompt, system_prompt, temperature, schema, stream=True)
+
+        try:
+            async with self._slots, self.client.stream(
+                "POST", self.generate_url, json=payload
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPStatusError as e:
+            raise LLMError(f"Ollama API error: {e.response.status_code}")
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            raise LLMError(f"Ollama streaming failed: {str(e)}")
+
+    def _build_payload(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: Optional[float],
+        schema: Optional[Dict],
+        stream: bool,
+    ) -> Dict:
+        # Ollama constrains decoding to the schema itself, so it stays out of the prompt
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "system": (system_prompt or "") + JSON_ONLY_INSTRUCTION,
+            "format": schema or "json",
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": self._resolve_temperature(temperature), "num_predict": settings.llm_max_output_tokens},
+        }
 
     async def check_health(self) -> bool:
         try:
-            response = await self.client.get(f"{self.base_url}/api/tags")
+            # Shares the pooled client (and its warm connections) with generation
+            response = await self.client.get(self.tags_url, timeout=HEALTH_CHECK_TIMEOUT)
             return response.status_code == 200
         except Exception:
             return False
@@ -105,27 +222,47 @@ class AnthropicLLMClient(BaseLLMClient):
 
         self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
         self.model = settings.anthropic_model
+        self._api_error = anthropic.AnthropicError
 
     async def generate_json(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: float = 0.3,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
     ) -> Dict[Any, Any]:
-        json_system = (system_prompt or "") + "\n\nYou must respond with valid JSON only. No markdown, no explanation."
-
         try:
             message = await self.client.messages.create(
                 model=self.model,
-                max_tokens=4096,
-                temperature=temperature,
-                system=json_system,
+                max_tokens=settings.llm_max_output_tokens,
+                temperature=self._resolve_temperature(temperature),
+                system=self._schema_system_prompt(system_prompt, schema),
                 messages=[{"role": "user", "content": prompt}],
             )
             raw = message.content[0].text
-            return self._extract_json(raw)
-        except Exception as e:
-            raise Exception(f"Anthropic generation failed: {str(e)}")
+        except self._api_error as e:
+            raise LLMError(f"Anthropic generation failed: {str(e)}")
+        return self._extract_json(raw)
+
+    async def _stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        try:
+            async with self.client.messages.stream(
+                model=self.model,
+                max_tokens=settings.llm_max_output_tokens,
+                temperature=self._resolve_temperature(temperature),
+                system=self._schema_system_prompt(system_prompt, schema),
+                messages=[{"role": "user", "content": prompt}],
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        except self._api_error as e:
+            raise LLMError(f"Anthropic streaming failed: {str(e)}")
 
     async def check_health(self) -> bool:
         return bool(settings.anthropic_api_key)
@@ -134,10 +271,118 @@ class AnthropicLLMClient(BaseLLMClient):
         await self.client.close()
 
 
+class CachedLLMClient(BaseLLMClient):
+    """Wraps a provider client with an exact-match response cache"""
+
+    def __init__(self, client: BaseLLMClient, cache: ResponseCache):
+        self.client = client
+        self.cache = cache
+        # Part of every key, so a persisted entry is never served to a different model
+        self.model = client.model
+
+    async def _cache_get(self, key: str) -> Optional[Any]:
+        if self.cache.blocking:
+            return await asyncio.to_thread(self.cache.get, key)
+        return self.cache.get(key)
+
+    async def _cache_set(self, key: str, value: Any):
+        if self.cache.blocking:
+            await asyncio.to_thread(self.cache.set, key, value)
+        else:
+            self.cache.set(key, value)
+
+    async def generate_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+        cache: bool = True,
+    ) -> Dict[Any, Any]:
+        if not cache:
+            return await self.client.generate_json(prompt, system_prompt, temperature, schema)
+
+        # The effective temperature, so changing LLM_TEMPERATURE never serves old responses
+        key = make_cache_key(
+            self.model, system_prompt, prompt, self._resolve_temperature(temperature), json.dumps(schema, sort_keys=True)
+        )
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        result = await self.client.generate_json(prompt, system_prompt, temperature, schema)
+        await self._cache_set(key, result)
+        return result
+
+    def _stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        return self.client._stream_text(prompt, system_prompt, temperature, schema)
+
+    async def stream_json(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        schema: Optional[Dict] = None,
+        cache: bool = True,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        if not cache:
+            async with aclosing(self.client.stream_json(prompt, system_prompt, temperature, schema)) as items:
+                async for item in items:
+                    yield item
+            return
+
+        key = make_cache_key(
+            "stream",
+            self.model,
+            system_prompt,
+            prompt,
+            self._resolve_temperature(temperature),
+            json.dumps(schema, sort_keys=True),
+        )
+        cached = await self._cache_get(key)
+        if cached is not None:
+            for array_key, values in cached.items():
+                for value in values:
+                    yield array_key, value
+            return
+
+        # Only a stream that ran to completion is cached; an early exit or a
+        # truncated response (stream_json raises) leaves no entry
+        collected: Dict[str, list] = {}
+        async with aclosing(self.client.stream_json(prompt, system_prompt, temperature, schema)) as items:
+            async for array_key, value in items:
+                collected.setdefault(array_key, []).append(value)
+                yield array_key, value
+        await self._cache_set(key, collected)
+
+    async def check_health(self) -> bool:
+        return await self.client.check_health()
+
+    async def close(self):
+        await self.client.close()
+        self.cache.close()
+
+
+@lru_cache(maxsize=1)
 def get_llm_client() -> BaseLLMClient:
+    """The process-wide LLM client, built on first use rather than at import"""
     if settings.llm_provider == "anthropic":
-        return AnthropicLLMClient()
-    return OllamaClient()
+        client = AnthropicLLMClient()
+    else:
+        client = OllamaClient()
 
-
-llm_client = get_llm_client()
+    if settings.llm_cache_enabled:
+        if settings.llm_cache_path:
+            cache = DiskResponseCache(
+                settings.llm_cache_path, max_entries=settings.llm_cache_max_entries, ttl=settings.llm_cache_ttl
+            )
+        else:
+            cache = ResponseCache(max_entries=settings.llm_cache_max_entries, ttl=settings.llm_cache_ttl)
+        return CachedLLMClient(client, cache)
+    return client
@@ -0,0 +1,58 @@
+"""
+Logging Setup
+Routes application log records through a queue so log I/O never blocks the event loop
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional, Tuple
+
+from app.config import settings
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+# The app logger's (level, propagate) before start_logging, restored by stop_logging
+_saved_config: Optional[Tuple[int, bool]] = None
+
+
+def start_logging() -> logging.handlers.QueueListener:
+    """Attach a QueueHandler to the app logger and start the listener thread that writes records.
+
+    Idempotent: repeated calls (e.g. a second lifespan in the same process) return the
+    running listener instead of stacking another handler on the logger.
+    """
+    global _listener, _queue_handler, _saved_config
+    if _listener is not None:
+        return _listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    app_logger = logging.getLogger("app")
+    _saved_config = (app_logger.level, app_logger.propagate)
+    app_logger.setLevel(settings.log_level.upper())
+    app_logger.addHandler(_queue_handler)
+    app_logger.propagate = False
+
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records, stop the listener thread, and undo start_logging's changes to the app logger."""
+    global _listener, _queue_handler, _saved_config
+    if _listener is None:
+        return
+    _listener.stop()
+    app_logger = logging.getLogger("app")
+    app_logger.removeHandler(_queue_handler)
+    app_logger.setLevel(_saved_config[0])
+    app_logger.propagate = _saved_config[1]
+    _listener = None
+    _queue_handler = None
+    _saved_config = None
@@ -2,7 +2,7 @@
 Data Models
 Simplified Pydantic models for analysis results
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from enum import Enum
 
@@ -33,8 +33,7 @@ class FailurePattern(BaseModel):
     indicators: List[str] = Field(default_factory=list)
     why_easy_to_miss: str = ""
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True, frozen=True)
 
 
 class Finding(BaseModel):
@@ -48,7 +47,25 @@ class Finding(BaseModel):
     why_easy_to_miss: str = ""
     discussion_questions: List[str] = Field(default_factory=list)
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True, frozen=True)
 
 
+# LLM response schemas — passed to the provider to constrain decoding
+
+class PatternMatch(BaseModel):
+    """A single pattern match as returned by the LLM"""
+    pattern_name: str
+    confidence: ConfidenceLevel
+    match_score: float = Field(ge=0.0, le=1.0)
+    evidence: List[str] = Field(default_factory=list)
+    trigger_conditions: List[str] = Field(default_factory=list)
+    why_easy_to_miss: str = ""
+    discussion_questions: List[str] = Field(default_factory=list)
+
+
+class DocumentAnalysisResponse(BaseModel):
+    """Combined response for pattern matching, assumptions, known unknowns, and ruled-out risks"""
+    assumptions: List[str]
+    unknowns: List[str]
+    ruled_out: List[str]
+    matches: List[PatternMatch]
@@ -410,6 +410,8 @@ PATTERNS = [
     ),
 ]
 
+PATTERNS_BY_ID = {p.id: p for p in PATTERNS}
+
 
 def get_all_patterns():
     """Return all available failure patterns"""
@@ -418,10 +420,7 @@ def get_all_patterns():
 
 def get_pattern_by_id(pattern_id: str):
     """Get a specific pattern by ID"""
-    for pattern in PATTERNS:
-        if pattern.id == pattern_id:
-            return pattern
-    return None
+    return PATTERNS_BY_ID.get(pattern_id)
 
 
 def get_patterns_by_category(category: PatternCategory):
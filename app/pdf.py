@@ -0,0 +1,26 @@
+"""
+PDF Text Extraction
+Runs in worker processes, so this module stays free of app-level imports
+"""
+import io
+
+try:
+    import pypdf
+except ImportError:  # PDF uploads are optional
+    pypdf = None
+
+
+class PDFExtractionError(Exception):
+    """Raised when a PDF cannot be parsed"""
+
+
+def extract_pdf_text(content: bytes) -> str:
+    """Extract and join the text of every page of a PDF."""
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(content))
+        pages_text = [page.extract_text() for page in reader.pages]
+    except Exception as e:
+        # pypdf raises plain ValueError, KeyError, etc. on some corrupt files, not
+        # only PyPdfError; anything that fails here means the upload is unreadable
+        raise PDFExtractionError(str(e) or type(e).__name__)
+    return "\n\n".join(t for t in pages_text if t)
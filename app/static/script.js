@@ -154,20 +154,26 @@ async function performAnalysisUpload(formData) {
 
 // Map SSE progress events to UI updates
 const PROGRESS_STEPS = {
-    start: { text: 'Analyzing patterns, assumptions, and unknowns in parallel...', pct: 15 },
+    start: { text: 'Analyzing patterns, assumptions, and unknowns...', pct: 15 },
     patterns_done: { text: null, pct: 70 },  // text is dynamic
     analysis_done: { text: 'Generating final report...', pct: 90 },
     complete: { text: 'Done.', pct: 100 },
 };
 
 function handleProgressEvent(event) {
+    if (event.step === 'finding') {
+        // Findings stream in one at a time while the model is still generating
+        updateLoadingProgress(`Detected ${event.data.pattern_name} (${event.data.confidence})...`);
+        return;
+    }
+
     const step = PROGRESS_STEPS[event.step];
     if (!step) return;
 
     let text = step.text;
     if (event.step === 'patterns_done') {
         const count = event.data?.count ?? 0;
-        text = `Found ${count} pattern match${count !== 1 ? 'es' : ''}. Checking ruled-out risks...`;
+        text = `Found ${count} pattern match${count !== 1 ? 'es' : ''}.`;
     }
 
     updateLoadingProgress(text, step.pct);
@@ -177,7 +183,7 @@ function updateLoadingProgress(text, percent) {
     const el = document.getElementById('loading-text');
     const bar = document.getElementById('progress-bar');
     if (el && text) el.textContent = text;
-    if (bar) bar.style.width = `${percent}%`;
+    if (bar && percent !== undefined) bar.style.width = `${percent}%`;
 }
 
 // Display results
@@ -0,0 +1,137 @@
+"""
+Streaming JSON Parser
+Incremental parser that surfaces array elements from a partially streamed JSON object
+"""
+import re
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+# The only characters that matter inside a string; everything else is skipped in C
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# Outside strings: one structural character or a whole scalar run, skipping whitespace
+_TOKEN_RE = re.compile(r'[{}\[\]",]|[^\s{}\[\]",]+')
+
+
+class JSONStreamParser:
+    """Tracks string/escape state and a bracket stack over streamed text.
+
+    Each time an element of a top-level array (e.g. the items of
+    ``{"matches": [...]}``) closes, it is parsed and returned as a
+    ``(key, value)`` pair. Text before the first ``{`` — such as a markdown
+    fence — is ignored, and elements that fail to parse are skipped.
+    ``complete`` turns true once the top-level object closes; a stream that
+    ends before then was cut off.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+        self.complete = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume the next chunk and return any array elements it completed."""
+        self._buffer += text
+        buf = self._buffer
+        items = []
+
+        i = self._pos
+        end = len(buf)
+        while i < end:
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    i += 1
+                    continue
+                special = _STRING_SPECIAL_RE.search(buf, i)
+                if special is None:
+                    break
+                i = special.start()
+                if buf[i] == "\\":
+                    self._escaped = True
+                else:
+                    self._in_string = False
+                    if depth == 1:
+                        self._last_key = buf[self._string_start + 1 : i]
+                    elif depth == 2 and self._element_start == self._string_start:
+                        self._emit(items, i + 1)
+                i += 1
+                continue
+
+            if depth == 0:
+                i = buf.find("{", i)
+                if i < 0:
+                    break
+                token = None
+            else:
+                token = _TOKEN_RE.search(buf, i)
+                if token is None:
+                    break
+                i = token.start()
+            ch = buf[i]
+
+            in_array = depth == 2 and self._array_key is not None
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if in_array and self._element_start is None:
+                    self._element_start = i
+            elif ch in "{[":
+                if in_array and self._element_start is None:
+                    self._element_start = i
+                if ch == "[" and depth == 1:
+                    self._array_key = self._last_key
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if depth == 1:
+                    self.complete = True
+                elif depth == 3 and self._array_key is not None and self._element_start is not None:
+                    self._emit(items, i + 1)
+                elif depth == 2 and ch == "]":
+                    if self._element_start is not None:
+                        self._emit(items, i)
+                    self._array_key = None
+            elif ch == ",":
+                if in_array and self._element_start is not None:
+                    self._emit(items, i)
+            else:
+                # A scalar (number, true, false, null) is consumed as one token
+                if in_array and self._element_start is None:
+                    self._element_start = i
+                i = token.end() - 1
+
+            i += 1
+
+        # Drop text that no open string or pending element still points into, so
+        # appending the next chunk copies a few hundred bytes, not the whole response
+        keep = len(buf)
+        if self._element_start is not None:
+            keep = self._element_start
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if keep:
+            self._buffer = buf[keep:]
+            self._string_start -= keep
+            if self._element_start is not None:
+                self._element_start -= keep
+        self._pos = len(self._buffer)
+        return items
+
+    def _emit(self, items: List[Tuple[str, Any]], end: int):
+        raw = self._buffer[self._element_start : end]
+        self._element_start = None
+        try:
+            items.append((self._array_key, orjson.loads(raw)))
+        except orjson.JSONDecodeError:
+            pass
@@ -0,0 +1,68 @@
+"""
+Pattern Prefilter Tests
+Checks DesignAnalyzer._candidate_patterns against a naive per-indicator search
+"""
+import random
+import re
+import unittest
+
+from app.analyzer import DesignAnalyzer
+
+# Filler that can glue indicators together or split them at word boundaries
+_FILLER = ["the", "a", "shared", "pool", "-", ".", ",", "\n", "once", "Cache", "retry", "at", "least"]
+
+
+class CandidatePatternsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = DesignAnalyzer()
+        cls.indicators = sorted({i for p in cls.analyzer.patterns for i in p.indicators})
+
+    def naive_candidates(self, document: str) -> list:
+        """Every pattern with an indicator appearing at word boundaries, one search per indicator"""
+        text = document.lower()
+        return [
+            p
+            for p in self.analyzer.patterns
+            if any(re.search(rf"\b{re.escape(i.lower())}\b", text) for i in p.indicators)
+        ]
+
+    def assert_matches_naive(self, document: str):
+        self.assertEqual(
+            [p.id for p in self.analyzer._candidate_patterns(document)],
+            [p.id for p in self.naive_candidates(document)],
+        )
+
+    def test_contained_indicator_is_credited(self):
+        document = "All services use a shared connection pool."
+        self.assert_matches_naive(document)
+        ids = {p.id for p in self.analyzer._candidate_patterns(document)}
+        indicators = {"shared connection pool", "connection pool"}
+        expected = {p.id for p in self.analyzer.patterns if indicators & set(p.indicators)}
+        self.assertGreater(len(expected), 1)
+        self.assertLessEqual(expected, ids)
+
+    def test_prefix_indicator_is_credited(self):
+        document = "Consumers rely on at-least-once delivery from the queue."
+        self.assert_matches_naive(document)
+        ids = {p.id for p in self.analyzer._candidate_patterns(document)}
+        indicators = {"at-least-once", "at-least-once delivery"}
+        expected = {p.id for p in self.analyzer.patterns if indicators & set(p.indicators)}
+        self.assertGreater(len(expected), 1)
+        self.assertLessEqual(expected, ids)
+
+    def test_case_and_word_boundaries(self):
+        self.assert_matches_naive("CONNECTION POOLING is not a Connection Pool")
+        self.assertEqual(self.analyzer._candidate_patterns("nothing relevant here"), [])
+
+    def test_matches_naive_search_on_random_documents(self):
+        for seed in range(300):
+            rng = random.Random(seed)
+            words = [rng.choice(self.indicators + _FILLER) for _ in range(rng.randint(0, 25))]
+            document = " ".join(words)
+            with self.subTest(seed=seed):
+                self.assert_matches_naive(document)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Response Cache Tests
+Eviction, expiry, and failure handling for the in-memory and SQLite caches
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from app.cache import DiskResponseCache, ResponseCache
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResponseCache(ttl=10)
+        with mock.patch("app.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("app.cache.time.monotonic", return_value=105.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("app.cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_returns_copies(self):
+        cache = ResponseCache()
+        cache.set("a", {"items": [1]})
+        cache.get("a")["items"].append(2)
+        self.assertEqual(cache.get("a"), {"items": [1]})
+
+
+class DiskResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def open_cache(self, **kwargs) -> DiskResponseCache:
+        cache = DiskResponseCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_round_trip_survives_reopen(self):
+        cache = self.open_cache()
+        cache.set("a", {"matches": [{"x": 1}]})
+        cache.close()
+        self.assertEqual(self.open_cache().get("a"), {"matches": [{"x": 1}]})
+
+    def test_evicts_oldest_written_first(self):
+        cache = self.open_cache(max_entries=2)
+        for stored_at, key in enumerate("abc"):
+            with mock.patch("app.cache.time.time", return_value=float(stored_at)):
+                cache.set(key, key)
+            # Reads don't refresh an entry, so "a" is still the oldest
+            cache.get("a")
+        self.assertEqual([cache.get(k) for k in "abc"], [None, "b", "c"])
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.open_cache(ttl=10)
+        with mock.patch("app.cache.time.time", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("app.cache.time.time", return_value=105.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("app.cache.time.time", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_unreadable_row_is_dropped_as_a_miss(self):
+        cache = self.open_cache()
+        cache.set("a", 1)
+        cache._db.execute("UPDATE responses SET value = '{not json' WHERE key = 'a'")
+        with self.assertLogs("app.cache", "WARNING"):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_locked_database_skips_the_write(self):
+        cache = self.open_cache()
+        cache._db.execute("PRAGMA busy_timeout = 0")
+        cache.set("a", 1)
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN EXCLUSIVE")
+        try:
+            with self.assertLogs("app.cache", "WARNING"):
+                cache.set("b", 2)
+        finally:
+            other.execute("ROLLBACK")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_database_error_on_read_is_a_miss(self):
+        cache = DiskResponseCache(self.path)
+        cache.set("a", 1)
+        cache.close()
+        with self.assertLogs("app.cache", "WARNING"):
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Streaming Tests
+Checks JSONStreamParser against json.loads for arbitrary chunk boundaries, and
+that stream_json and CachedLLMClient handle truncated and complete streams
+"""
+import asyncio
+import json
+import random
+import unittest
+from unittest import mock
+
+import orjson
+
+from app.cache import ResponseCache
+from app.llm import BaseLLMClient, CachedLLMClient, LLMError
+from app.streaming import JSONStreamParser
+
+# Characters that exercise string and escape handling when they land on a chunk boundary
+_TRICKY = 'ab "\\\n{}[],:é'
+
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_TRICKY) for _ in range(rng.randint(0, 30)))
+
+
+def _random_document(rng: random.Random) -> dict:
+    return {
+        "assumptions": [_random_text(rng) for _ in range(rng.randint(0, 4))],
+        "unknowns": [_random_text(rng) for _ in range(rng.randint(0, 3))],
+        "ruled_out": [],
+        "summary": _random_text(rng),
+        "matches": [
+            {
+                "pattern_name": _random_text(rng),
+                "match_score": rng.random(),
+                "evidence": [_random_text(rng), _random_text(rng)],
+                "nested": {"x": [1, None, {"y": _random_text(rng)}]},
+            }
+            for _ in range(rng.randint(0, 5))
+        ],
+        "scalars": [1, -2.5e3, True, False, None],
+    }
+
+
+def _expected_items(text: str) -> list:
+    """What the parser should surface: every element of every top-level array, in order"""
+    obj = json.loads(text)
+    return [(key, item) for key, value in obj.items() if isinstance(value, list) for item in value]
+
+
+def _feed_all(parser: JSONStreamParser, chunks) -> list:
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    return items
+
+
+def _random_chunks(text: str, rng: random.Random) -> list:
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 40)
+        chunks.append(text[i : i + size])
+        i += size
+    return chunks
+
+
+class JSONStreamParserTests(unittest.TestCase):
+    def test_matches_json_loads_for_random_chunking(self):
+        for seed in range(500):
+            rng = random.Random(seed)
+            text = json.dumps(
+                _random_document(rng), indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5
+            )
+            parser = JSONStreamParser()
+            with self.subTest(seed=seed):
+                self.assertEqual(_feed_all(parser, _random_chunks(text, rng)), _expected_items(text))
+                self.assertTrue(parser.complete)
+
+    def test_escaped_quotes(self):
+        text = json.dumps({"evidence": ['say "retry" now', '\\"', 'end\\']})
+        for size in range(1, 6):
+            chunks = [text[i : i + size] for i in range(0, len(text), size)]
+            with self.subTest(size=size):
+                self.assertEqual(_feed_all(JSONStreamParser(), chunks), _expected_items(text))
+
+    def test_trailing_backslash_at_chunk_boundary(self):
+        text = json.dumps({"assumptions": ['a \\" b', "c"]})
+        # Split right after each backslash so the escaped character starts the next chunk
+        for cut in [i + 1 for i, ch in enumerate(text) if ch == "\\"]:
+            with self.subTest(cut=cut):
+                items = _feed_all(JSONStreamParser(), [text[:cut], text[cut:]])
+                self.assertEqual(items, _expected_items(text))
+
+    def test_ignores_text_around_the_object(self):
+        body = '{"matches": [{"a": 1}, {"b": [2, 3]}]}'
+        items = _feed_all(JSONStreamParser(), ["```json\n", body, "\n```"])
+        self.assertEqual(items, _expected_items(body))
+
+    def test_truncated_stream_yields_closed_elements_only(self):
+        text = json.dumps({"assumptions": ["a", "b"], "matches": [{"x": 1}, {"x": 2}]})
+        cut = text.rindex('{"x": 2')
+        parser = JSONStreamParser()
+        items = _feed_all(parser, [text[:cut + 4]])
+        self.assertEqual(items, [("assumptions", "a"), ("assumptions", "b"), ("matches", {"x": 1})])
+        self.assertFalse(parser.complete)
+
+
+class _ScriptedClient(BaseLLMClient):
+    """Answers every prompt with a fixed response text, streamed in small chunks"""
+
+    model = "test"
+
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    async def generate_json(self, prompt, system_prompt=None, temperature=None, schema=None):
+        self.calls += 1
+        return orjson.loads(self.text)
+
+    async def _stream_text(self, prompt, system_prompt=None, temperature=None, schema=None):
+        self.calls += 1
+        for i in range(0, len(self.text), 7):
+            yield self.text[i : i + 7]
+
+    async def check_health(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+
+async def _collect(client: BaseLLMClient) -> list:
+    return [item async for item in client.stream_json("prompt")]
+
+
+class CachedStreamTests(unittest.TestCase):
+    def test_truncated_stream_raises_after_partial_items(self):
+        client = _ScriptedClient('{"assumptions": ["a"], "matches": [{"x": 1}, {"x"')
+        items = []
+
+        async def consume():
+            async for item in client.stream_json("prompt"):
+                items.append(item)
+
+        with self.assertRaises(LLMError):
+            asyncio.run(consume())
+        self.assertEqual(items, [("assumptions", "a"), ("matches", {"x": 1})])
+
+    def test_truncated_stream_is_not_cached(self):
+        client = _ScriptedClient('{"matches": [{"x": 1}, {"x"')
+        cached = CachedLLMClient(client, ResponseCache())
+        with self.assertRaises(LLMError):
+            asyncio.run(_collect(cached))
+        self.assertEqual(len(cached.cache), 0)
+
+    def test_complete_stream_is_cached(self):
+        client = _ScriptedClient('{"matches": [{"x": 1}]}')
+        cached = CachedLLMClient(client, ResponseCache())
+        first = asyncio.run(_collect(cached))
+        second = asyncio.run(_collect(cached))
+        self.assertEqual(first, second)
+        self.assertEqual(client.calls, 1)
+
+    def test_generate_json_is_cached_per_temperature(self):
+        client = _ScriptedClient('{"matches": []}')
+        cached = CachedLLMClient(client, ResponseCache())
+        with mock.patch("app.llm.settings.llm_temperature", 0.0):
+            self.assertEqual(asyncio.run(cached.generate_json("prompt")), {"matches": []})
+            asyncio.run(cached.generate_json("prompt", temperature=0.0))
+        with mock.patch("app.llm.settings.llm_temperature", 0.7):
+            asyncio.run(cached.generate_json("prompt"))
+        self.assertEqual(client.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()